@@ -192,16 +192,16 @@ def process_csv(
 
             try:
                 print(f"Downloading document {content_document_id} (agency: {agency_name}, title: {title})")
-                out_path = download_michigan_pdf(
+                out_path, sha256 = download_michigan_pdf(
                     document_id=content_document_id,
                     document_agency=agency_name if agency_name else None,
                     document_name=title if title else None,
                     document_date=created_date if created_date else None,
-                    output_dir=output_dir
+                    output_dir=output_dir,
+                    return_sha256=True,
                 )
 
                 if out_path:
-                    sha256 = compute_sha256(out_path)
                     print(f"Saved to: {out_path}")
                     print(f"SHA256: {sha256}")
 
@@ -1,5 +1,6 @@
 import requests
 import base64
+import hashlib
 import urllib3
 import os
 import re
@@ -55,7 +56,8 @@ def get_content_base_data(document_id):
         return None
 
 # Note: I think we can do the same thing here using get_content_base_data
-def download_michigan_pdf(document_id, document_agency=None, document_name=None, document_date=None, output_dir="./"):
+def download_michigan_pdf(document_id, document_agency=None, document_name=None, document_date=None, output_dir="./",
+                          return_sha256=False):
     """
     Download a PDF from Michigan Child Welfare Public Licensing Search
 
@@ -64,10 +66,14 @@ def download_michigan_pdf(document_id, document_agency=None, document_name=None,
         document_agency (str, optional): Name of the agency for filename
         document_name (str, optional): Name of the document for filename
         output_dir (str): Directory to save the PDF (default: current directory)
+        return_sha256 (bool): Also return the SHA256 of the PDF, computed from the
+            downloaded bytes so the saved file does not need to be read back
 
     Returns:
-        str: Path to the downloaded file if successful, None if failed
+        str: Path to the downloaded file if successful, None if failed.
+        If return_sha256 is True, a (path, sha256) tuple instead, or (None, None) if failed.
     """
+    failed = (None, None) if return_sha256 else None
 
     # Disable SSL warnings
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -106,14 +112,16 @@ def download_michigan_pdf(document_id, document_agency=None, document_name=None,
         print(f"PDF downloaded successfully: {file_path}")
         print(f"File size: {len(pdf_content)} bytes")
 
+        if return_sha256:
+            return file_path, hashlib.sha256(pdf_content).hexdigest()
         return file_path
 
     except requests.exceptions.RequestException as e:
         print(f"Error making request: {e}")
-        return None
+        return failed
     except Exception as e:
         print(f"Error processing PDF: {e}")
-        return None
+        return failed
 
 def generate_filename(document_id, document_agency, document_name, document_date):
     """
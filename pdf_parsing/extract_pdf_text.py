@@ -1,102 +1,296 @@
 #!/usr/bin/env python3
 """
-Extract text from PDF files using pdfplumber and save to compressed Parquet files.
+Extract text from PDF files using PDFium (pypdfium2) or pdfplumber and save to
+compressed Parquet files.
 
 Each PDF is hashed using SHA256, and the output contains:
 - sha256: SHA256 hash of the PDF file
 - text: List of strings, one per page
-- dateprocessed: ISO 8601 timestamp when the PDF was processed
+- dateprocessed: ISO 8601 timestamp of the ingestion batch that processed the PDF
 
 Output is organized in a subdirectory with multiple timestamped Parquet files,
 each representing a new ingestion batch. PDFs that are already processed
 (based on their SHA256 hash across all existing Parquet files) are skipped.
 
-Parquet files use compression (zstd) for efficient storage and are named
-with timestamps: YYYYMMDD_HHMMSS_pdf_text.parquet
+Parquet files use compression (zstd by default; see --compression) and are named
+with timestamps: YYYYMMDD_HHMMSS_pdf_text.parquet. A sidecar index
+(_sha256_index.feather) of the hashes in those files is kept alongside them
+so each run only reads batch files it has not seen before.
 """
 import argparse
 import hashlib
 import json
 import logging
+import mmap
 import os
 import random
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Set
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-import pandas as pd
 import pdfplumber
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pypdfium2 as pdfium
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 
-def calculate_sha256(file_path: str) -> str:
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+PARALLEL_HASH_MIN_FILES = 8
+WRITE_BATCH_SIZE = 32
+MAX_IN_FLIGHT_PER_WORKER = 2
+PROGRESS_LOG_INTERVAL = 10
+# Codec choices for the output Parquet files. Leaving the level unset uses the
+# codec's own default (zstd level 1 in Arrow), which favors write speed.
+COMPRESSION_CODECS = ("zstd", "lz4", "snappy")
+DEFAULT_COMPRESSION = "zstd"
+
+# Sidecar listing every processed sha256, so startup does not have to read
+# every batch file. Deliberately not *.parquet so batch-file globs skip it.
+SHA256_INDEX_FILENAME = "_sha256_index.feather"
+SHA256_INDEX_SCHEMA = pa.schema([
+    ("sha256", pa.binary(32)),  # Raw digest, half the size of the hex string
+    ("source_file", pa.string()),
+])
+
+PARQUET_SCHEMA = pa.schema([
+    ("sha256", pa.string()),
+    ("text", pa.list_(pa.string())),  # One string per page
+    ("dateprocessed", pa.string()),
+])
+
+
+def calculate_sha256(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
     """Calculate SHA256 hash of a file with broad Python-version compatibility."""
     with open(file_path, "rb") as f:
+        # Hash the whole file in a single update call on a memory map
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher = hashlib.sha256()
+                hasher.update(mm)
+                return hasher.hexdigest()
+        except (ValueError, OSError):
+            # Empty files cannot be mapped, and some filesystems do not support mmap
+            pass
+
         if hasattr(hashlib, "file_digest"):
             digest = hashlib.file_digest(f, "sha256")
             return digest.hexdigest()
 
         # Fallback for Python versions without hashlib.file_digest (e.g., 3.9)
         hasher = hashlib.sha256()
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+        for chunk in iter(lambda: f.read(chunk_size), b""):
             hasher.update(chunk)
         return hasher.hexdigest()
 
 
-def load_processed_ids(parquet_dir: str) -> Set[str]:
-    """Load set of already processed PDF IDs from all Parquet files in output directory."""
-    processed = set()
-    output_path = Path(parquet_dir)
+def _try_calculate_sha256(file_path: str) -> Optional[str]:
+    """Hash a file, logging and returning None if it cannot be read."""
+    try:
+        return calculate_sha256(file_path)
+    except Exception as e:
+        logger.error(f"Error hashing {Path(file_path).name}: {e}")
+        return None
 
-    if not output_path.exists():
-        return processed
 
-    # Find all parquet files in the directory
-    parquet_files = list(output_path.glob("*.parquet"))
+def hash_files(file_paths: List[Path], max_workers: Optional[int] = None) -> Dict[Path, Optional[str]]:
+    """Hash many files, spreading the work over a process pool for larger batches.
 
-    for parquet_file in parquet_files:
+    Returns a dict mapping each path to its SHA256, or None if it could not be hashed.
+    """
+    path_strs = [str(p) for p in file_paths]
+    if len(path_strs) < PARALLEL_HASH_MIN_FILES:
+        # Not worth the process start-up cost for a handful of files
+        hashes = [_try_calculate_sha256(p) for p in path_strs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            hashes = list(executor.map(_try_calculate_sha256, path_strs, chunksize=16))
+    return dict(zip(file_paths, hashes))
+
+
+def _parquet_signature(parquet_file: Path) -> str:
+    """Size of a batch file, as a sanity check on its (write-once) name.
+
+    mtime is deliberately left out: a fresh checkout resets it, which would
+    invalidate the committed index on every CI run.
+    """
+    return str(parquet_file.stat().st_size)
+
+
+def _read_sha256_index(index_path: Path) -> Tuple[pa.Table, Dict[str, str]]:
+    """Read the sidecar index, returning (table, {source_file: signature})."""
+    empty = SHA256_INDEX_SCHEMA.empty_table()
+    if not index_path.exists():
+        return empty, {}
+    try:
+        table = feather.read_table(index_path)
+        sources = json.loads(table.schema.metadata[b"sources"])
+        return table.select(SHA256_INDEX_SCHEMA.names).cast(SHA256_INDEX_SCHEMA), sources
+    except Exception as e:
+        logger.warning(f"Could not read {index_path}, rebuilding it: {e}")
+        return empty, {}
+
+
+def _write_sha256_index(index_path: Path, table: pa.Table, sources: Dict[str, str]) -> None:
+    """Atomically replace the sidecar index."""
+    table = table.replace_schema_metadata({"sources": json.dumps(sources, sort_keys=True)})
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    try:
+        feather.write_feather(table, tmp_path)
+        os.replace(tmp_path, index_path)
+    except Exception as e:
+        logger.warning(f"Could not write {index_path}: {e}")
+
+
+def _hex_to_digests(hex_hashes: List[Optional[str]], parquet_file: Path) -> List[bytes]:
+    """Convert hex SHA256 strings to raw digests, skipping malformed values."""
+    digests = []
+    for hex_hash in hex_hashes:
         try:
-            df = pd.read_parquet(parquet_file)
-            if 'sha256' in df.columns:
-                processed.update(df['sha256'].tolist())
+            digest = bytes.fromhex(hex_hash)
+        except (TypeError, ValueError):
+            digest = None
+        if digest is None or len(digest) != 32:
+            logger.warning(f"Skipping malformed sha256 {hex_hash!r} in {parquet_file}")
+            continue
+        digests.append(digest)
+    return digests
+
+
+def update_sha256_index(parquet_dir: str) -> pa.Table:
+    """Bring the sidecar sha256 index in line with the batch files and return it.
+
+    The index lists (sha256, source_file) for every record and remembers each
+    batch file's size. Only batch files that are new or changed since the index
+    was written are read; entries for removed or changed files are dropped.
+    """
+    output_path = Path(parquet_dir)
+    index_path = output_path / SHA256_INDEX_FILENAME
+    table, sources = _read_sha256_index(index_path)
+
+    # Find all parquet files in the directory
+    current = {f.name: _parquet_signature(f) for f in output_path.glob("*.parquet")}
+    stale = [name for name, sig in sources.items() if current.get(name) != sig]
+    to_scan = [name for name, sig in current.items() if sources.get(name) != sig]
+    if not stale and not to_scan:
+        return table
+
+    if stale:
+        keep = pc.invert(pc.is_in(table.column("source_file"), value_set=pa.array(stale, pa.string())))
+        table = table.filter(keep)
+        for name in stale:
+            del sources[name]
+
+    tables = [table]
+    for name in sorted(to_scan):
+        parquet_file = output_path / name
+        try:
+            # Read only the sha256 column, never the page text
+            if 'sha256' in pq.read_schema(parquet_file).names:
+                hex_hashes = pq.read_table(parquet_file, columns=['sha256']).column('sha256').to_pylist()
+            else:
+                hex_hashes = []
         except Exception as e:
             logger.warning(f"Could not read {parquet_file}: {e}")
             continue
+        digests = _hex_to_digests(hex_hashes, parquet_file)
+        tables.append(pa.table(
+            [pa.array(digests, pa.binary(32)), pa.repeat(name, len(digests)).cast(pa.string())],
+            schema=SHA256_INDEX_SCHEMA,
+        ))
+        sources[name] = current[name]
 
-    return processed
+    table = pa.concat_tables(tables)
+    _write_sha256_index(index_path, table, sources)
+    return table
 
 
-def load_all_records(parquet_dir: str) -> Dict[str, dict]:
-    """Load all records from Parquet files in output directory, indexed by sha256."""
-    records = {}
+def load_processed_ids(parquet_dir: str) -> Set[bytes]:
+    """Load set of already processed PDF IDs from all Parquet files in output directory.
+
+    IDs are raw 32-byte SHA256 digests (bytes.fromhex of the stored hex string),
+    which take roughly half the memory of the hex strings.
+    """
+    if not Path(parquet_dir).exists():
+        return set()
+
+    return set(update_sha256_index(parquet_dir).column('sha256').to_pylist())
+
+
+def load_record_locations(parquet_dir: str) -> Dict[str, Tuple[Path, int]]:
+    """Map each record's sha256 to (parquet_file, row_index) without loading any page text."""
+    locations = {}
     output_path = Path(parquet_dir)
 
     if not output_path.exists():
-        return records
+        return locations
 
     # Find all parquet files in the directory
-    parquet_files = list(output_path.glob("*.parquet"))
+    parquet_files = sorted(output_path.glob("*.parquet"))
 
     for parquet_file in parquet_files:
         try:
-            df = pd.read_parquet(parquet_file)
-            for _, row in df.iterrows():
-                record = row.to_dict()
-                if 'sha256' in record:
-                    records[record['sha256']] = record
+            if 'sha256' not in pq.read_schema(parquet_file).names:
+                continue
+            hashes = pq.read_table(parquet_file, columns=['sha256']).column('sha256').to_pylist()
         except Exception as e:
             logger.warning(f"Could not read {parquet_file}: {e}")
             continue
+        for row_index, pdf_hash in enumerate(hashes):
+            if pdf_hash is not None:
+                locations[pdf_hash] = (parquet_file, row_index)
+
+    return locations
 
-    return records
 
+def read_record_text(parquet_file: Path, row_index: int) -> Optional[list[str]]:
+    """Read one record's page text, decoding only the row group that contains it."""
+    parquet = pq.ParquetFile(parquet_file)
+    for row_group in range(parquet.num_row_groups):
+        num_rows = parquet.metadata.row_group(row_group).num_rows
+        if row_index < num_rows:
+            table = parquet.read_row_group(row_group, columns=['text'])
+            return table.column('text')[row_index].as_py()
+        row_index -= num_rows
+    raise IndexError(f"Row out of range in {parquet_file}")
 
-def extract_text_from_pdf(pdf_path: str) -> list[str]:
-    """Extract text from PDF, returning a list of strings (one per page)."""
+
+def _normalize_pdfium_text(text: str) -> str:
+    """Make PDFium output match pdfplumber's line conventions.
+
+    PDFium separates lines with CRLF (and can emit stray bare CRs), and marks a
+    word hyphenated across a line break with the noncharacter U+FFFE while
+    dropping the break itself; pdfplumber gives "-" followed by a newline.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.replace("\ufffe", "-\n")
+
+
+def _extract_text_pdfium(pdf_path: str) -> list[str]:
+    pages_text = []
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            pages_text.append(_normalize_pdfium_text(textpage.get_text_range()))
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return pages_text
+
+
+def _extract_text_pdfplumber(pdf_path: str) -> list[str]:
     pages_text = []
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
@@ -105,25 +299,156 @@ def extract_text_from_pdf(pdf_path: str) -> list[str]:
     return pages_text
 
 
+EXTRACTION_ENGINES = {
+    "pdfium": _extract_text_pdfium,
+    "pdfplumber": _extract_text_pdfplumber,
+}
+DEFAULT_ENGINE = "pdfium"
+# Batch files record their engine in the Parquet schema metadata under this
+# key; files written before that was recorded were all extracted with pdfplumber
+ENGINE_METADATA_KEY = b"extraction_engine"
+LEGACY_ENGINE = "pdfplumber"
+
+
+def extract_text_from_pdf(pdf_path: str, engine: str = DEFAULT_ENGINE) -> list[str]:
+    """Extract text from PDF, returning a list of strings (one per page).
+
+    Args:
+        pdf_path: Path to the PDF file
+        engine: "pdfium" (fast, C-based) or "pdfplumber" (layout-aware, slower)
+    """
+    return EXTRACTION_ENGINES[engine](pdf_path)
+
+
+def _process_one(pdf_path_str: str, pdf_hash: str, dateprocessed: str, engine: str = DEFAULT_ENGINE) -> dict:
+    """Extract one PDF into a Parquet record. Runs in a worker process."""
+    pages_text = extract_text_from_pdf(pdf_path_str, engine)
+    # Create record with the batch timestamp
+    return {
+        "sha256": pdf_hash,
+        "text": pages_text,  # List of strings, one per page
+        "dateprocessed": dateprocessed
+    }
+
+
+def _extract_records(
+    pending: List[Tuple[Path, str]],
+    dateprocessed: str,
+    max_workers: Optional[int] = None,
+    engine: str = DEFAULT_ENGINE,
+) -> Iterator[Tuple[Path, Optional[dict], Optional[Exception]]]:
+    """Extract PDFs in parallel, yielding (pdf_path, record, error) as each one finishes.
+
+    PDFs are submitted in the given order, with at most MAX_IN_FLIGHT_PER_WORKER
+    per worker outstanding at a time. Closing the generator early (e.g. when a
+    limit is reached) cancels any PDFs that have not started yet.
+    """
+    if max_workers == 1 or len(pending) < 2:
+        for pdf_path, pdf_hash in pending:
+            try:
+                yield pdf_path, _process_one(str(pdf_path), pdf_hash, dateprocessed, engine), None
+            except Exception as e:
+                yield pdf_path, None, e
+        return
+
+    max_workers = max_workers or os.cpu_count()
+    jobs = iter(pending)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        unsubmitted: List[Path] = []
+        broken: Optional[BrokenProcessPool] = None
+
+        def submit(count: int) -> None:
+            nonlocal broken
+            if broken is not None:
+                return
+            for pdf_path, pdf_hash in islice(jobs, count):
+                try:
+                    futures[executor.submit(_process_one, str(pdf_path), pdf_hash, dateprocessed, engine)] = pdf_path
+                except BrokenProcessPool as e:
+                    broken = e
+                    unsubmitted.append(pdf_path)
+                    return
+
+        # Keep only a few PDFs per worker in flight, so finished records (and their
+        # page text) are not all held in memory until the whole batch is done
+        submit(MAX_IN_FLIGHT_PER_WORKER * max_workers)
+        try:
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pdf_path = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. OOM kill or a crash in native code); every
+                        # PDF still in flight fails with it and nothing more can be run
+                        broken = e
+                        yield pdf_path, None, e
+                        continue
+                    except Exception as e:
+                        yield pdf_path, None, e
+                    else:
+                        yield pdf_path, result, None
+                    submit(1)
+
+            # Report the PDFs the broken pool never got to as errors too
+            if broken is not None:
+                for pdf_path in unsubmitted + [pdf_path for pdf_path, _ in jobs]:
+                    yield pdf_path, None, broken
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _write_record_batch(
+    writer: Optional[pq.ParquetWriter],
+    output_parquet: Path,
+    records: List[dict],
+    compression: str = DEFAULT_COMPRESSION,
+    compression_level: Optional[int] = None,
+    engine: str = DEFAULT_ENGINE,
+) -> pq.ParquetWriter:
+    """Append records to the batch Parquet file, opening the writer on first use."""
+    if writer is None:
+        writer = pq.ParquetWriter(
+            output_parquet,
+            PARQUET_SCHEMA.with_metadata({ENGINE_METADATA_KEY: engine.encode()}),
+            compression=compression,
+            compression_level=compression_level,
+        )
+    writer.write_batch(pa.RecordBatch.from_pylist(records, schema=PARQUET_SCHEMA))
+    return writer
+
+
 def format_time(seconds: float) -> str:
     """Format time in seconds to human-readable string."""
     if seconds < 60:
-        return f"{seconds:.1f}s"
-    elif seconds < 3600:
-        minutes = seconds / 60
-        return f"{minutes:.1f}m"
-    else:
-        hours = seconds / 3600
-        return f"{hours:.1f}h"
-
-
-def process_directory(pdf_dir: str, parquet_dir: str, limit: int = None) -> None:
+        return "%.1fs" % seconds
+    if seconds < 3600:
+        return "%.1fm" % (seconds / 60)
+    return "%.1fh" % (seconds / 3600)
+
+
+def process_directory(
+    pdf_dir: str,
+    parquet_dir: str,
+    limit: int = None,
+    workers: int = None,
+    engine: str = DEFAULT_ENGINE,
+    compression: str = DEFAULT_COMPRESSION,
+    compression_level: int = None,
+) -> None:
     """Process all PDFs in directory and save results to timestamped Parquet file.
 
     Args:
         pdf_dir: Directory containing PDF files
         parquet_dir: Output directory for Parquet files
         limit: Maximum number of PDFs to process (excludes already-processed/skipped files)
+        workers: Number of extraction worker processes (default: one per CPU)
+        engine: Text extraction engine, see EXTRACTION_ENGINES
+        compression: Parquet compression codec, see COMPRESSION_CODECS
+        compression_level: Codec compression level (default: codec default)
     """
     pdf_dir_path = Path(pdf_dir)
 
@@ -135,6 +460,58 @@ def process_directory(pdf_dir: str, parquet_dir: str, limit: int = None) -> None
         logger.error(f"'{pdf_dir}' is not a directory")
         sys.exit(1)
 
+    # Find all PDF files
+    pdf_files = list(pdf_dir_path.glob("*.pdf")) + list(pdf_dir_path.glob("*.PDF"))
+    logger.info(f"Found {len(pdf_files)} PDF files in directory")
+
+    process_files(
+        pdf_files,
+        parquet_dir,
+        limit=limit,
+        workers=workers,
+        engine=engine,
+        compression=compression,
+        compression_level=compression_level,
+    )
+
+
+def process_files(
+    pdf_paths: List[Path],
+    parquet_dir: str,
+    limit: int = None,
+    workers: int = None,
+    engine: str = DEFAULT_ENGINE,
+    compression: str = DEFAULT_COMPRESSION,
+    compression_level: int = None,
+    known_hashes: Optional[Dict[Path, str]] = None,
+) -> None:
+    """Process the given PDFs and save results to a timestamped Parquet file.
+
+    Args:
+        pdf_paths: PDF files to process
+        parquet_dir: Output directory for Parquet files
+        limit: Maximum number of PDFs to process (excludes already-processed/skipped files)
+        workers: Number of extraction worker processes (default: one per CPU)
+        engine: Text extraction engine, see EXTRACTION_ENGINES
+        compression: Parquet compression codec, see COMPRESSION_CODECS
+        compression_level: Codec compression level (default: codec default)
+        known_hashes: SHA256 of PDFs the caller has already hashed (e.g. at download
+            time), keyed by path; these files are not hashed again
+    """
+    pdf_files = [Path(p) for p in pdf_paths]
+
+    # Caller-supplied hashes are normalized to lowercase hex; anything that is not
+    # a SHA256 hex digest is reported and the file is hashed again instead
+    checked_hashes = {}
+    for pdf_path, pdf_hash in (known_hashes or {}).items():
+        pdf_path = Path(pdf_path)
+        normalized = (pdf_hash or "").strip().lower()
+        if len(normalized) == 64 and all(c in "0123456789abcdef" for c in normalized):
+            checked_hashes[pdf_path] = normalized
+        else:
+            logger.warning(f"Ignoring malformed sha256 {pdf_hash!r} for {pdf_path.name}, re-hashing")
+    known_hashes = checked_hashes
+
     # Create output directory if it doesn't exist
     output_path = Path(parquet_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -143,21 +520,38 @@ def process_directory(pdf_dir: str, parquet_dir: str, limit: int = None) -> None
     processed_ids = load_processed_ids(parquet_dir)
     logger.info(f"Found {len(processed_ids)} already processed PDFs across existing Parquet files")
 
-    # Find all PDF files
-    pdf_files = list(pdf_dir_path.glob("*.pdf")) + list(pdf_dir_path.glob("*.PDF"))
-    logger.info(f"Found {len(pdf_files)} PDF files in directory")
+    # Hash every PDF once up front and work out which ones still need extracting
+    pdf_hashes = hash_files([p for p in pdf_files if p not in known_hashes])
+    pdf_hashes.update((p, known_hashes[p]) for p in pdf_files if p in known_hashes)
+    pending = []
+    batch_paths: Dict[bytes, Path] = {}
+    skipped_count = 0
+    duplicate_count = 0
+    error_count = 0
+    for pdf_path, pdf_hash in sorted(pdf_hashes.items()):
+        # Hashing failed (already logged)
+        if pdf_hash is None:
+            error_count += 1
+            continue
 
-    # Count how many actually need processing by checking which ones are already done
-    new_files_count = 0
-    for pdf_path in pdf_files:
-        try:
-            pdf_hash = calculate_sha256(str(pdf_path))
-            if pdf_hash not in processed_ids:
-                new_files_count += 1
-        except Exception:
-            # If we can't hash it, count it as needing processing
-            new_files_count += 1
+        # Skip if already processed
+        digest = bytes.fromhex(pdf_hash)
+        if digest in processed_ids:
+            logger.info(f"Skipping (already processed): {pdf_path.name}")
+            skipped_count += 1
+            continue
 
+        # Extract identical files only once per batch; the copy shares the
+        # first file's outcome, so it is reported separately from skips
+        if digest in batch_paths:
+            logger.info(f"Skipping (duplicate of {batch_paths[digest].name}): {pdf_path.name}")
+            duplicate_count += 1
+            continue
+
+        batch_paths[digest] = pdf_path
+        pending.append((pdf_path, pdf_hash))
+
+    new_files_count = len(pending)
     to_process_count = new_files_count
 
     # Apply limit if specified
@@ -171,83 +565,96 @@ def process_directory(pdf_dir: str, parquet_dir: str, limit: int = None) -> None
         logger.info("No new PDFs to process!")
         return
 
-    # Generate timestamped filename for this batch
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # One timestamp for the whole batch: it names the output file and is
+    # recorded as every record's dateprocessed
+    batch_time = datetime.now()
+    timestamp = batch_time.strftime("%Y%m%d_%H%M%S")
+    dateprocessed = batch_time.isoformat()
     output_parquet = output_path / f"{timestamp}_pdf_text.parquet"
 
-    # Collect all records for this batch
-    records = []
+    # Stream records to the batch file as they are extracted
+    buffer = []
+    writer = None
     processed_count = 0
-    skipped_count = 0
-    error_count = 0
     start_time = time.time()
 
-    for idx, pdf_path in enumerate(sorted(pdf_files), 1):
+    try:
+        with closing(_extract_records(pending, dateprocessed, workers, engine)) as results:
+            for pdf_path, record, error in results:
+                if error is not None:
+                    logger.error(f"Error processing {pdf_path.name}: {error}")
+                    error_count += 1
+                    continue
+
+                buffer.append(record)
+                processed_count += 1
+                if len(buffer) >= WRITE_BATCH_SIZE:
+                    writer = _write_record_batch(
+                        writer, output_parquet, buffer, compression, compression_level, engine
+                    )
+                    buffer.clear()
+
+                logger.info(
+                    f"[{processed_count}/{to_process_count}] Processed: {pdf_path.name} "
+                    f"({len(record['text'])} pages)"
+                )
+
+                # Log time estimates periodically rather than for every PDF
+                if processed_count % PROGRESS_LOG_INTERVAL == 0:
+                    elapsed_time = time.time() - start_time
+                    avg_time_per_pdf = elapsed_time / processed_count
+                    remaining = to_process_count - processed_count
+                    estimated_remaining = avg_time_per_pdf * remaining
+
+                    elapsed_str = format_time(elapsed_time)
+                    remaining_str = format_time(estimated_remaining)
+                    logger.info(f"  -> Time: {elapsed_str} elapsed, ~{remaining_str} remaining (est.)")
+
+                # Check if we've hit the limit; leaving the loop cancels queued PDFs
+                if limit is not None and processed_count >= limit:
+                    logger.info(f"Reached processing limit of {limit} PDFs, stopping")
+                    break
+    finally:
+        # Flush and index what was extracted even if the loop failed part-way,
+        # so finished records are not thrown away
         try:
-            # Calculate SHA256 hash
-            pdf_hash = calculate_sha256(str(pdf_path))
-
-            # Skip if already processed
-            if pdf_hash in processed_ids:
-                logger.info(f"[{idx}/{len(pdf_files)}] Skipping (already processed): {pdf_path.name}")
-                skipped_count += 1
-                continue
-
-            # Check if we've hit the limit
-            if limit is not None and processed_count >= limit:
-                logger.info(f"Reached processing limit of {limit} PDFs, stopping")
-                break
-
-            # Extract text
-            logger.info(f"[{idx}/{len(pdf_files)}] Processing: {pdf_path.name}")
-            pages_text = extract_text_from_pdf(str(pdf_path))
-
-            # Create record with timestamp
-            record = {
-                "sha256": pdf_hash,
-                "text": pages_text,  # List of strings, one per page
-                "dateprocessed": datetime.now().isoformat()
-            }
-
-            records.append(record)
-            processed_count += 1
-
-            # Add to processed_ids to prevent duplicates within the same batch
-            processed_ids.add(pdf_hash)
-
-            # Calculate time estimates
-            elapsed_time = time.time() - start_time
-            avg_time_per_pdf = elapsed_time / processed_count
-            remaining = to_process_count - processed_count
-            estimated_remaining = avg_time_per_pdf * remaining
-
-            elapsed_str = format_time(elapsed_time)
-            remaining_str = format_time(estimated_remaining)
-
-            logger.info(f"  -> Processed {len(pages_text)} pages")
-            logger.info(f"  -> Time: {elapsed_str} elapsed, ~{remaining_str} remaining (est.)")
-
-        except Exception as e:
-            logger.error(f"Error processing {pdf_path.name}: {e}")
-            error_count += 1
-            continue
-
-    # Save all records to Parquet file with compression
-    if records:
-        df = pd.DataFrame(records)
-        df.to_parquet(output_parquet, compression='zstd', index=False)
-        logger.info(f"Saved {len(records)} records to {output_parquet}")
+            if buffer:
+                writer = _write_record_batch(
+                    writer, output_parquet, buffer, compression, compression_level, engine
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+                update_sha256_index(parquet_dir)
+
+    # Always report the final time, even if errors kept the count short of the target
+    logger.info(f"  -> Time: {format_time(time.time() - start_time)} elapsed (total)")
+
+    if writer is not None:
+        logger.info(f"Saved {processed_count} records to {output_parquet}")
     else:
         logger.info("No new records to save")
 
     logger.info("Summary:")
     logger.info(f"  Processed: {processed_count}")
     logger.info(f"  Skipped: {skipped_count}")
+    logger.info(f"  Duplicates in batch: {duplicate_count}")
     logger.info(f"  Errors: {error_count}")
 
 
-def spot_check(pdf_dir: str, parquet_dir: str, num_checks: int) -> None:
-    """Spot check existing records by re-extracting and comparing."""
+def read_extraction_engine(parquet_file: Path) -> str:
+    """Return the engine a batch file was extracted with, per its schema metadata."""
+    metadata = pq.read_schema(parquet_file).metadata or {}
+    engine = metadata.get(ENGINE_METADATA_KEY)
+    return engine.decode() if engine else LEGACY_ENGINE
+
+
+def spot_check(pdf_dir: str, parquet_dir: str, num_checks: int, engine: Optional[str] = None) -> None:
+    """Spot check existing records by re-extracting and comparing.
+
+    Each record is re-extracted with the engine recorded in its batch file
+    (pdfplumber for files that predate the recording) unless engine is given.
+    """
     pdf_dir_path = Path(pdf_dir)
 
     if not pdf_dir_path.exists():
@@ -258,10 +665,10 @@ def spot_check(pdf_dir: str, parquet_dir: str, num_checks: int) -> None:
         logger.error(f"'{pdf_dir}' is not a directory")
         sys.exit(1)
 
-    # Load all existing records from Parquet files
-    logger.info(f"Loading existing records from {parquet_dir}...")
-    records = load_all_records(parquet_dir)
-    logger.info(f"Loaded {len(records)} existing records")
+    # Index existing records by sha256; page text is read only for sampled PDFs
+    logger.info(f"Indexing existing records in {parquet_dir}...")
+    records = load_record_locations(parquet_dir)
+    logger.info(f"Indexed {len(records)} existing records")
 
     if len(records) == 0:
         logger.info("No records to spot check!")
@@ -271,14 +678,11 @@ def spot_check(pdf_dir: str, parquet_dir: str, num_checks: int) -> None:
     pdf_files = list(pdf_dir_path.glob("*.pdf")) + list(pdf_dir_path.glob("*.PDF"))
 
     # Filter to only PDFs we have records for
-    pdf_files_with_records = []
-    for pdf_path in pdf_files:
-        try:
-            pdf_hash = calculate_sha256(str(pdf_path))
-            if pdf_hash in records:
-                pdf_files_with_records.append((pdf_path, pdf_hash))
-        except Exception:
-            continue
+    pdf_files_with_records = [
+        (pdf_path, pdf_hash)
+        for pdf_path, pdf_hash in hash_files(pdf_files).items()
+        if pdf_hash is not None and pdf_hash in records
+    ]
 
     if len(pdf_files_with_records) == 0:
         logger.info("No PDFs found that match existing records!")
@@ -292,17 +696,23 @@ def spot_check(pdf_dir: str, parquet_dir: str, num_checks: int) -> None:
 
     passed = 0
     failed = 0
+    file_engines: Dict[Path, str] = {}
 
     for pdf_path, pdf_hash in sample:
         try:
             logger.info(f"Checking: {pdf_path.name}")
 
-            # Re-extract text
-            pages_text = extract_text_from_pdf(str(pdf_path))
+            # Re-extract text with the engine that produced the record
+            parquet_file, row_index = records[pdf_hash]
+            record_engine = engine
+            if record_engine is None:
+                if parquet_file not in file_engines:
+                    file_engines[parquet_file] = read_extraction_engine(parquet_file)
+                record_engine = file_engines[parquet_file]
+            pages_text = extract_text_from_pdf(str(pdf_path), record_engine)
 
-            # Get existing record
-            existing_record = records[pdf_hash]
-            existing_text = existing_record["text"]
+            # Read the existing record's text
+            existing_text = read_record_text(parquet_file, row_index) or []
 
             # Compare
             if pages_text == existing_text:
@@ -311,11 +721,14 @@ def spot_check(pdf_dir: str, parquet_dir: str, num_checks: int) -> None:
             else:
                 logger.error(f"  ✗ FAIL - Text mismatch!")
                 logger.error(f"    Expected {len(existing_text)} pages, got {len(pages_text)} pages")
-                if len(pages_text) == len(existing_text):
-                    # Same number of pages, check which pages differ
-                    for i, (old, new) in enumerate(zip(existing_text, pages_text)):
-                        if old != new:
-                            logger.error(f"    Page {i+1} differs")
+                # Report differing pages in one line (over the shared pages if counts differ)
+                differing = [
+                    str(i + 1)
+                    for i, (old, new) in enumerate(zip(existing_text, pages_text))
+                    if old != new
+                ]
+                if differing:
+                    logger.error(f"    Pages differ: {', '.join(differing)}")
                 failed += 1
 
         except Exception as e:
@@ -360,6 +773,32 @@ def main():
         metavar="N",
         help="Process at most N PDFs (skipped files don't count toward limit)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="Number of worker processes for text extraction (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(EXTRACTION_ENGINES),
+        help=(
+            f"Text extraction engine (default: {DEFAULT_ENGINE}). "
+            "With --spot-check, overrides the engine recorded in each batch file"
+        )
+    )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSION_CODECS,
+        default=DEFAULT_COMPRESSION,
+        help=f"Parquet compression codec (default: {DEFAULT_COMPRESSION})"
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        metavar="N",
+        help="Compression level for zstd/lz4 (default: codec default)"
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -368,6 +807,9 @@ def main():
 
     args = parser.parse_args()
 
+    if args.compression_level is not None and args.compression == "snappy":
+        parser.error("--compression-level is not supported with snappy compression")
+
     # Configure logging
     logging.basicConfig(
         level=logging.DEBUG if args.verbose else logging.INFO,
@@ -375,9 +817,17 @@ def main():
     )
 
     if args.spot_check is not None:
-        spot_check(args.pdf_dir, args.parquet_dir, args.spot_check)
+        spot_check(args.pdf_dir, args.parquet_dir, args.spot_check, engine=args.engine)
     else:
-        process_directory(args.pdf_dir, args.parquet_dir, limit=args.limit)
+        process_directory(
+            args.pdf_dir,
+            args.parquet_dir,
+            limit=args.limit,
+            workers=args.workers,
+            engine=args.engine or DEFAULT_ENGINE,
+            compression=args.compression,
+            compression_level=args.compression_level,
+        )
 
 
 if __name__ == "__main__":
@@ -13,15 +13,17 @@ Pipeline steps:
 
 import argparse
 import csv
-import hashlib
 import os
-import shutil
-import tempfile
 from datetime import datetime, timezone
+from pathlib import Path
 from typing import Dict, List, Optional
 
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
 from download_pdf import download_michigan_pdf
-from pdf_parsing.extract_pdf_text import process_directory as process_pdf_directory
+from pdf_parsing.extract_pdf_text import HASH_CHUNK_SIZE, calculate_sha256, hash_files
+from pdf_parsing.extract_pdf_text import process_files as process_pdf_files
 from pull_agency_info_api import get_all_agency_info, get_content_details_method
 
 
@@ -36,29 +38,52 @@ DEFAULT_PARQUET_DIR = "pdf_parsing/parquet_files"
 def load_csv_rows(csv_path: str) -> List[Dict[str, str]]:
     if not os.path.exists(csv_path):
         return []
-    with open(csv_path, newline="", encoding="utf-8") as fh:
+    # utf-8-sig drops a leading BOM so it cannot end up in the first column name
+    with open(csv_path, newline="", encoding="utf-8-sig") as fh:
+        header = next(csv.reader(fh), None)
+    if not header:
+        return []
+
+    # Parse in Arrow's multi-threaded CSV reader, keeping every column as text.
+    # Arrow is given the header read above rather than parsing its own, so the
+    # column_types keys always match the column names. skip_rows counts physical
+    # lines, so a header with a quoted newline is left to DictReader.
+    if not any("\n" in name or "\r" in name for name in header):
+        try:
+            table = pa_csv.read_csv(
+                csv_path,
+                read_options=pa_csv.ReadOptions(column_names=header, skip_rows=1),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in header},
+                    strings_can_be_null=False,
+                ),
+            )
+            return table.to_pylist()
+        except pa.ArrowInvalid:
+            # Ragged or otherwise malformed rows; DictReader tolerates these
+            pass
+
+    with open(csv_path, newline="", encoding="utf-8-sig") as fh:
         reader = csv.DictReader(fh)
         return [row for row in reader]
 
 
 def build_metadata_index(rows: List[Dict[str, str]]) -> Dict[str, Dict[str, str]]:
-    by_id = {}
-    for row in rows:
-        content_document_id = (row.get("ContentDocumentId") or "").strip()
-        if content_document_id:
-            by_id[content_document_id] = row
-    return by_id
+    """Index rows by ContentDocumentId (last row wins).
 
+    The index holds references to the same row dicts, not copies, so updates
+    through either the list or the index are visible in both.
+    """
+    return {
+        content_document_id: row
+        for row in rows
+        if (content_document_id := (row.get("ContentDocumentId") or "").strip())
+    }
 
-def compute_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
-    digest = hashlib.sha256()
-    with open(file_path, "rb") as fh:
-        while True:
-            chunk = fh.read(chunk_size)
-            if not chunk:
-                break
-            digest.update(chunk)
-    return digest.hexdigest()
+
+def compute_sha256(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    return calculate_sha256(file_path, chunk_size=chunk_size)
 
 
 def resolve_local_file_path(row: Dict[str, str], download_dir: str) -> Optional[str]:
@@ -89,7 +114,7 @@ def preflight_backfill_missing_sha(
     download_dir: str,
 ) -> int:
     """Fill missing sha256 for rows that already have a local file path."""
-    updated = 0
+    pending = []
     for row in metadata_rows:
         content_document_id = (row.get("ContentDocumentId") or "").strip()
         if not content_document_id:
@@ -103,10 +128,21 @@ def preflight_backfill_missing_sha(
         if not local_path:
             continue
 
+        pending.append((row, content_document_id, local_path))
+
+    # Hash all files together so larger backfills are spread across CPUs
+    hashes = hash_files([Path(local_path) for _, _, local_path in pending])
+
+    updated = 0
+    for row, content_document_id, local_path in pending:
+        sha256 = hashes[Path(local_path)]
+        if sha256 is None:
+            continue
+
         row["downloaded_path"] = local_path
         row["downloaded_filename"] = os.path.basename(local_path)
         row["generated_filename"] = row.get("generated_filename") or os.path.basename(local_path)
-        row["sha256"] = compute_sha256(local_path)
+        row["sha256"] = sha256
         row["download_status"] = row.get("download_status") or "backfilled_preflight"
         row["id_match_checked"] = "true"
         metadata_by_id[content_document_id] = row
@@ -167,36 +203,31 @@ def write_csv_rows(csv_path: str, rows: List[Dict[str, str]]) -> None:
     with open(csv_path, "w", newline="", encoding="utf-8") as fh:
         writer = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction="ignore")
         writer.writeheader()
-        for row in rows:
-            writer.writerow({k: row.get(k, "") for k in fieldnames})
+        writer.writerows({k: row.get(k, "") for k in fieldnames} for row in rows)
 
 
 def parse_new_downloads_to_parquet(new_rows: List[Dict[str, str]], parquet_dir: str) -> None:
-    """Parse newly downloaded PDFs into parquet by staging only this run's files."""
+    """Parse newly downloaded PDFs into parquet, passing only this run's files."""
     if not new_rows:
         print("No new downloads in this run; skipping PDF parsing step.")
         return
 
-    with tempfile.TemporaryDirectory(prefix="mcyj_new_downloads_") as staging_dir:
-        staged_count = 0
-        for row in new_rows:
-            file_path = (row.get("downloaded_path") or "").strip()
-            if not file_path or not os.path.exists(file_path):
-                continue
-
-            target_path = os.path.join(staging_dir, os.path.basename(file_path))
-            try:
-                os.symlink(file_path, target_path)
-            except OSError:
-                shutil.copy2(file_path, target_path)
-            staged_count += 1
-
-        if staged_count == 0:
-            print("No valid downloaded files available for parsing; skipping PDF parsing step.")
-            return
+    pdf_paths = []
+    known_hashes = {}
+    for row in new_rows:
+        file_path = (row.get("downloaded_path") or "").strip()
+        if file_path and os.path.exists(file_path):
+            pdf_paths.append(Path(file_path))
+            # Hash computed at download time; no need to read the file again
+            if row.get("sha256"):
+                known_hashes[Path(file_path)] = row["sha256"]
+
+    if not pdf_paths:
+        print("No valid downloaded files available for parsing; skipping PDF parsing step.")
+        return
 
-        print(f"Running PDF parsing on {staged_count} newly downloaded files...")
-        process_pdf_directory(staging_dir, parquet_dir, limit=None)
+    print(f"Running PDF parsing on {len(pdf_paths)} newly downloaded files...")
+    process_pdf_files(pdf_paths, parquet_dir, limit=None, known_hashes=known_hashes)
 
 
 def main() -> None:
@@ -378,18 +409,18 @@ def main() -> None:
             attempted_new += 1
             created_date_iso = parse_created_date_to_iso(record.get("CreatedDate", ""))
 
-            out_path = download_michigan_pdf(
+            out_path, sha256 = download_michigan_pdf(
                 document_id=content_document_id,
                 document_agency=agency_name if agency_name else None,
                 document_name=record.get("Title", "") or None,
                 document_date=created_date_iso,
                 output_dir=download_dir,
+                return_sha256=True,
             )
 
             if not out_path:
                 continue
 
-            sha256 = compute_sha256(out_path)
             new_row = build_row(record, agency_name, agency_id, out_path, sha256)
             new_rows.append(new_row)
             metadata_by_id[content_document_id] = new_row